@@ -11,6 +11,8 @@
 # and fires alarms if things cross into or out of erronous zones.
 #
 # The alarm definitions and states are maintained in the database.
+# The AGE, RATE, and GAP aggregates are answered from the in-memory
+# liveness information rather than by querying the raw table.
 # Outgoing email messages are placed into mail_queue for delivery
 # by the SMTP module.
 #
@@ -18,6 +20,7 @@
 # data.
 ########################################################################
 
+import liveness
 import logging
 from common import conn, config_map, mail_queue, topics_by_id
 from contextlib import closing
@@ -30,7 +33,7 @@ from schedule import every, repeat
 
 AlarmState = Enum('AlarmState', ['UNKNOWN','STARTUP', 'TOO_LOW','TOO_HIGH','HEALTHY'])
 
-Aggregate = Enum('Aggregate', ['COUNT','AVG', 'MIN', 'MAX'])
+Aggregate = Enum('Aggregate', ['COUNT','AVG', 'MIN', 'MAX', 'AGE', 'RATE', 'GAP'])
 email_sender = config_map['email']['sender']
 email_recipients = config_map['email']['recipients']
 
@@ -72,27 +75,41 @@ def gen_sql(d:AlarmDefinition):
     return sql
 
 
+# Looks up the value of a liveness aggregate.  These need a sensor.
+def liveness_value(now, d:AlarmDefinition):
+    if d.sensor_id is None:
+        return None
+    elif d.agg == Aggregate.AGE:
+        return liveness.age(now, d.sensor_id)
+    elif d.agg == Aggregate.RATE:
+        return liveness.rate(d.sensor_id)
+    else:
+        return liveness.gap_seconds(now, d.sensor_id, d.window)
+
 # Computes the current state and value of this alarm
 def evaluate_alarm(now, d:AlarmDefinition):
-    with closing(conn.cursor()) as cur:
-        sql = gen_sql(d)
-        params = (now-d.window, now, d.sensor_id)
-        if d.sensor_id is None:
-            params = params[:2]
-        logging.debug(f'Executing {sql} with {params}')
-        cur.execute(sql, params)
-        value = cur.fetchone()[0]
-
-        if value is None:
-            state = AlarmState.UNKNOWN
-        elif d.min is not None and value < d.min:
-            state = AlarmState.TOO_LOW
-        elif d.max is not None and value > d.max:
-            state = AlarmState.TOO_HIGH
-        else:
-            state = AlarmState.HEALTHY    
-
-        return (state, value)
+    if d.agg in (Aggregate.AGE, Aggregate.RATE, Aggregate.GAP):
+        value = liveness_value(now, d)
+    else:
+        with closing(conn.cursor()) as cur:
+            sql = gen_sql(d)
+            params = (now-d.window, now, d.sensor_id)
+            if d.sensor_id is None:
+                params = params[:2]
+            logging.debug(f'Executing {sql} with {params}')
+            cur.execute(sql, params)
+            value = cur.fetchone()[0]
+
+    if value is None:
+        state = AlarmState.UNKNOWN
+    elif d.min is not None and value < d.min:
+        state = AlarmState.TOO_LOW
+    elif d.max is not None and value > d.max:
+        state = AlarmState.TOO_HIGH
+    else:
+        state = AlarmState.HEALTHY    
+
+    return (state, value)
 
 # Evaluates all alarms and queues emails as necessary
 @repeat(every(5).minutes)
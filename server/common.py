@@ -21,7 +21,7 @@ import os
 import queue
 from contextlib import closing
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
 from decimal import Decimal
 
 # Allows log level to be overriden by a environment variable.
@@ -30,6 +30,9 @@ LOG_LEVEL = os.environ.get('LOGLEVEL', 'INFO').upper()
 # Initialize the logger
 logging.basicConfig(format='%(asctime)s %(levelname)s:%(message)s', level=LOG_LEVEL)
 
+# Readings further apart than this are considered a gap in the data
+max_gap = timedelta(minutes=2)
+
 @dataclass
 class DataPoint:
     time: datetime
@@ -9,12 +9,16 @@
 #
 # This file contains a scheduled job that reads data points from the
 # ingest_queue and writes them to the database.  It runs once per minute
-# for low(ish) latency and reliability.
+# for low(ish) latency and reliability.  Readings for virtual sensors
+# are derived from each batch and written along with it.  Once a batch
+# is written the sensor liveness information is updated from it.
 ########################################################################
 
 import logging
 import os
+import liveness
 import queue
+import virtual
 from common import config_map, ingest_queue, conn, DataPoint
 from contextlib import closing
 from schedule import repeat, every
@@ -39,10 +43,12 @@ def read_pending():
 @repeat(every().minute)
 def ingest():
     batch = read_pending()
+    batch = batch + virtual.derive(batch)
     if batch:
         with closing(conn.cursor()) as cur:
             logging.debug(f'Inserting {batch}')
             cur.executemany(INSERT_SQL, batch)
     logging.debug(f'Inserted {len(batch)} data points')
+    liveness.update(batch)
             
             
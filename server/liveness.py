@@ -0,0 +1,125 @@
+########################################################################
+# Humidscope
+#
+# Humidity/Temperature/Power monitoring system.
+#
+# by Jim Shortz
+#
+# Sensor Liveness Module
+#
+# This file keeps track of when each sensor was last heard from, how
+# fast it is reporting, and the gaps in its data.  The ingest module
+# updates it as each batch is written so the alarm module can check on
+# sensors without scanning the raw table.
+#
+# Last-seen times and rates are saved in the liveness table so they
+# survive a restart.  Gaps are appended to the gaps table, which can be
+# queried for the full history.  All times are naive UTC, like the DB.
+########################################################################
+
+import logging
+from collections import deque
+from common import conn, sensor_ids, max_gap
+from contextlib import closing
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+# Constants
+rate_smoothing = 0.2     # Weight given to the newest batch in the rate average
+recent_gaps = 100        # Gaps kept in memory per sensor for alarming
+gap_history = timedelta(days=7)
+
+@dataclass
+class SensorLiveness:
+    last_seen: datetime | None = None
+    rate: float = 0.0    # Messages per minute (moving average)
+    gaps: deque = field(default_factory=lambda: deque(maxlen=recent_gaps))
+
+LOAD_LIVENESS_SQL = 'SELECT sensor_id, last_seen, rate FROM liveness'
+LOAD_GAPS_SQL = 'SELECT sensor_id, start_time, end_time FROM gaps WHERE end_time >= ? '\
+    'ORDER BY end_time'
+UPDATE_LIVENESS_SQL = 'INSERT liveness (sensor_id, last_seen, rate) VALUES (?,?,?) '\
+    'ON DUPLICATE KEY UPDATE last_seen=VALUES(last_seen), rate=VALUES(rate)'
+INSERT_GAP_SQL = 'INSERT gaps (sensor_id, start_time, end_time) VALUES (?,?,?) '\
+    'ON DUPLICATE KEY UPDATE end_time=end_time'
+
+def _load():
+    logging.info('Reading sensor liveness')
+    sensors = {sensor_id: SensorLiveness() for sensor_id in sensor_ids.values()}
+    since = datetime.now(timezone.utc).replace(tzinfo=None) - gap_history
+    with closing(conn.cursor()) as cur:
+        cur.execute(LOAD_LIVENESS_SQL)
+        for (sensor_id, last_seen, rate) in cur.fetchall():
+            sensors[sensor_id] = SensorLiveness(last_seen=last_seen, rate=rate)
+        cur.execute(LOAD_GAPS_SQL, (since,))
+        for (sensor_id, start_time, end_time) in cur.fetchall():
+            sensors[sensor_id].gaps.append((start_time, end_time))
+    return sensors
+
+# Updates liveness from a batch of (time, sensor_id, value) tuples that
+# has just been written to the raw table.  Should be called once per
+# ingest, even if the batch is empty, so rates decay for silent sensors.
+def update(batch):
+    global last_update
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    times = {sensor_id: [] for sensor_id in sensors}
+    for (time, sensor_id, value) in batch:
+        times.setdefault(sensor_id, []).append(time.replace(tzinfo=None))
+
+    new_gaps = []
+    for sensor_id, sensor_times in times.items():
+        s = sensors.setdefault(sensor_id, SensorLiveness())
+        for time in sorted(sensor_times):
+            if s.last_seen and time - s.last_seen > max_gap:
+                logging.warning('Sensor %s gap between %s and %s', sensor_id, s.last_seen, time)
+                s.gaps.append((s.last_seen, time))
+                new_gaps.append((sensor_id, s.last_seen, time))
+            if not s.last_seen or time > s.last_seen:
+                s.last_seen = time
+        if last_update:
+            minutes = (now - last_update).total_seconds() / 60
+            if minutes > 0:
+                s.rate = (1 - rate_smoothing) * s.rate + rate_smoothing * len(sensor_times) / minutes
+    last_update = now
+
+    with closing(conn.cursor()) as cur:
+        cur.executemany(UPDATE_LIVENESS_SQL, [(sensor_id, s.last_seen, s.rate)
+                                              for sensor_id, s in sensors.items() if s.last_seen])
+        if new_gaps:
+            cur.executemany(INSERT_GAP_SQL, new_gaps)
+
+# Seconds since the sensor was last heard from, or None if never
+def age(now, sensor_id):
+    s = sensors.get(sensor_id)
+    if s is None or s.last_seen is None:
+        return None
+    return (now.replace(tzinfo=None) - s.last_seen).total_seconds()
+
+# Moving average of messages per minute, or None if never heard from
+def rate(sensor_id):
+    s = sensors.get(sensor_id)
+    if s is None or s.last_seen is None:
+        return None
+    return s.rate
+
+# Seconds of missing data in the window ending at now, including a gap
+# that is still open because the sensor has gone quiet.
+def gap_seconds(now, sensor_id, window:timedelta):
+    s = sensors.get(sensor_id)
+    if s is None or s.last_seen is None:
+        return None
+    now = now.replace(tzinfo=None)
+    start = now - window
+    gaps = list(s.gaps)
+    if now - s.last_seen > max_gap:
+        gaps.append((s.last_seen, now))
+    total = 0.0
+    for (gap_start, gap_end) in gaps:
+        if gap_end > start:
+            total = total + (gap_end - max(gap_start, start)).total_seconds()
+    return total
+
+# Globals
+sensors = _load()
+last_update = None
@@ -15,13 +15,13 @@
 
 import logging
 from datetime import datetime, timedelta, timezone
-from common import conn, truncate_hour, config_map
+from common import conn, truncate_hour, config_map, max_gap
 from contextlib import closing
 from schedule import repeat, every
 
 # Constants
-max_gap = timedelta(minutes=2)
 comp_threshold = 200
+power_sensor_id = 3
 
 INSERT_CYCLE_SQL = 'insert into cycles (start_time, on_duration, off_duration) values (?,?,?)'
 LAST_CYCLE_SQL = '''select date_add(start_time, interval on_duration+off_duration second)
@@ -78,6 +78,83 @@ def cycle_analyze():
         
     logging.info(f'Wrote {row_count} records')
 
+INSERT_ENERGY_SQL = 'insert into energy (time, watt_hours, on_seconds, covered_seconds) values (?,?,?,?)'
+
+# Adds the energy of the reading interval t0..t1 into the per-hour totals.
+# The interval is clipped to start..end and split on hour boundaries, with
+# the power at each split interpolated linearly (trapezoidal rule).  The
+# compressor is considered on for the whole interval if it was on at t0,
+# matching the way cycle_analyze times its transitions.
+def _accumulate_energy(hours, t0, p0, t1, p1, start, end):
+    span = (t1 - t0).total_seconds()
+    if span <= 0:
+        return
+    is_on = p0 >= comp_threshold
+
+    def power_at(t):
+        return p0 + (p1 - p0) * (t - t0).total_seconds() / span
+
+    a = max(t0, start)
+    while a < min(t1, end):
+        hour = truncate_hour(a)
+        b = min(t1, end, hour + timedelta(hours=1))
+        secs = (b - a).total_seconds()
+        totals = hours[hour]
+        totals[0] += (power_at(a) + power_at(b)) / 2 * secs / 3600
+        totals[1] += secs if is_on else 0
+        totals[2] += secs
+        a = b
+
+# Integrates power readings into (watt_hours, on_seconds, covered_seconds)
+# for every hour between start and end.  Intervals longer than max_gap are
+# treated as missing data and contribute nothing.
+def integrate_energy(readings, start, end):
+    hours = {}
+    hour = start
+    while hour < end:
+        hours[hour] = [0.0, 0.0, 0.0]
+        hour = hour + timedelta(hours=1)
+
+    prev = None
+    for (is_time, power) in readings:
+        power = float(power)
+        if prev and (is_time - prev[0]) <= max_gap:
+            _accumulate_energy(hours, prev[0], prev[1], is_time, power, start, end)
+        prev = (is_time, power)
+    return hours
+
+@repeat(every().hour.at(':02'))
+def energy_analyze():
+    with closing(conn.cursor()) as cur:
+
+        # Resume after the last hour written.  Every hour gets a row, even
+        # if it has no data, so this only ever processes new readings.
+        cur.execute("select max(time) from energy")
+        start = cur.fetchone()[0]
+        if start:
+            start = start + timedelta(hours=1)
+        else:
+            cur.execute("select min(time) from raw where sensor_id = ?", (power_sensor_id,))
+            start = cur.fetchone()[0]
+            if not start:
+                logging.info("No power readings to integrate")
+                return
+            start = truncate_hour(start)
+        end = truncate_hour(datetime.now(timezone.utc)).replace(tzinfo=None)
+        if start >= end:
+            return
+
+        # Readings just outside the range are needed to complete the
+        # intervals that cross its edges.
+        logging.info("Integrating energy between %s and %s", start, end)
+        cur.execute("select time, value from raw where sensor_id = ? and time >= ? and time <= ? order by time",
+                    (power_sensor_id, start - max_gap, end + max_gap))
+        hours = integrate_energy(cur.fetchall(), start, end)
+        batch = [(hour, round(wh, 3), round(on), round(covered))
+                 for hour, (wh, on, covered) in sorted(hours.items())]
+        cur.executemany(INSERT_ENERGY_SQL, batch)
+    logging.info(f'Wrote {len(batch)} records')
+
 @repeat(every().hour.at(':02'))
 def hourly_summary():
     with closing(conn.cursor()) as cur:
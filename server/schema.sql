@@ -11,6 +11,14 @@ CREATE TABLE `cycles` (
   PRIMARY KEY (`start_time`)
 ) ENGINE=InnoDB DEFAULT CHARSET=latin1 COLLATE=latin1_swedish_ci;
 
+CREATE TABLE `energy` (
+  `time` datetime NOT NULL,
+  `watt_hours` decimal(10,3) NOT NULL,
+  `on_seconds` int NOT NULL,
+  `covered_seconds` int NOT NULL,
+  PRIMARY KEY (`time`)
+) ENGINE=InnoDB DEFAULT CHARSET=latin1 COLLATE=latin1_swedish_ci;
+
 CREATE TABLE `daily` (
   `time` date NOT NULL,
   `sensor_id` tinyint(4) NOT NULL,
@@ -42,10 +50,27 @@ CREATE TABLE `raw` (
   CONSTRAINT `fk_raw_sensors` FOREIGN KEY (`sensor_id`) REFERENCES `sensors` (`sensor_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=latin1 COLLATE=latin1_swedish_ci;
 
+CREATE TABLE `liveness` (
+  `sensor_id` tinyint(4) NOT NULL,
+  `last_seen` datetime NOT NULL,
+  `rate` float NOT NULL, -- messages per minute
+  PRIMARY KEY (`sensor_id`),
+  CONSTRAINT `fk_liveness_sensors` FOREIGN KEY (`sensor_id`) REFERENCES `sensors` (`sensor_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=latin1 COLLATE=latin1_swedish_ci;
+
+CREATE TABLE `gaps` (
+  `sensor_id` tinyint(4) NOT NULL,
+  `start_time` datetime NOT NULL,
+  `end_time` datetime NOT NULL,
+  PRIMARY KEY (`sensor_id`,`start_time`),
+  KEY `ix_gaps_end_time` (`end_time`),
+  CONSTRAINT `fk_gaps_sensors` FOREIGN KEY (`sensor_id`) REFERENCES `sensors` (`sensor_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=latin1 COLLATE=latin1_swedish_ci;
+
 CREATE TABLE `alarms` (
   `id`                varchar(32) NOT NULL,
   `sensor_id`         tinyint(4) NULL,
-  `aggregate`         ENUM('COUNT','MIN','MAX','AVG') NOT NULL,
+  `aggregate`         ENUM('COUNT','MIN','MAX','AVG','AGE','RATE','GAP') NOT NULL,
   `window`            int NOT NULL, -- in seconds
   `min_value`         decimal(6,2) NULL,
   `max_value`         decimal(6,2) NULL,
@@ -60,10 +85,16 @@ CREATE TABLE `alarms` (
 INSERT INTO `sensors` VALUES
 (1,'indoor-humid'),
 (2,'indoor-temp'),
-(3,'power');
+(3,'power'),
+(4,'dew-point'),
+(5,'abs-humid'),
+(6,'heat-index');
 
 INSERT INTO `alarms` VALUES
 ('humid', 1, 'AVG', 15*60, 30, 55, 'Humidity', 'HEALTHY'),
 ('temp', 2, 'AVG', 15*60, 60, 85, 'Temperature', 'HEALTHY'),
 ('power', 3, 'AVG', 15*60, 0, 600, 'Power', 'HEALTHY'),
-('dehumid', 3, 'MAX', 60*60, 200, NULL, 'Dehumidifer shutdown', 'HEALTHY');
+('dehumid', 3, 'MAX', 60*60, 200, NULL, 'Dehumidifer shutdown', 'HEALTHY'),
+('dew-point', 4, 'AVG', 15*60, NULL, 55, 'Dew point', 'HEALTHY'),
+('humid-stale', 1, 'AGE', 0, NULL, 5*60, 'Humidity sensor not reporting', 'HEALTHY'),
+('power-gaps', 3, 'GAP', 24*60*60, NULL, 60*60, 'Power sensor data gaps', 'HEALTHY');
@@ -0,0 +1,130 @@
+########################################################################
+# Humidscope
+#
+# Humidity/Temperature/Power monitoring system.
+#
+# by Jim Shortz
+#
+# Virtual Sensor Module
+#
+# This file computes derived readings (dew point, absolute humidity,
+# heat index) from pairs of humidity and temperature readings.  It is
+# called by the ingest module on each batch, and the derived readings
+# are written to the raw table under their own sensor_id.  To everything
+# downstream (alarms, hourly/daily summaries) they look like any other
+# sensor.
+#
+# Virtual sensors are defined in the "virtual_sensors" section of
+# config.json.  Each one needs a row in the sensors table.
+########################################################################
+
+import logging
+from bisect import bisect_left
+from common import config_map
+from dataclasses import dataclass, field
+from datetime import timedelta
+from math import exp, log
+from typing import Callable
+
+# Converts degrees Fahrenheit to Celsius and back
+def f_to_c(f):
+    return (f - 32) * 5 / 9
+
+def c_to_f(c):
+    return c * 9 / 5 + 32
+
+# Dew point in degrees F (Magnus formula)
+def dew_point(rh, temp):
+    t = f_to_c(temp)
+    gamma = log(rh / 100) + 17.62 * t / (243.12 + t)
+    return c_to_f(243.12 * gamma / (17.62 - gamma))
+
+# Absolute humidity in g/m^3
+def absolute_humidity(rh, temp):
+    t = f_to_c(temp)
+    return 6.112 * exp(17.67 * t / (t + 243.5)) * rh * 2.1674 / (273.15 + t)
+
+# Heat index in degrees F (NWS Rothfusz regression)
+def heat_index(rh, temp):
+    hi = 0.5 * (temp + 61 + (temp - 68) * 1.2 + rh * 0.094)
+    if (hi + temp) / 2 < 80:
+        return hi
+    hi = -42.379 + 2.04901523*temp + 10.14333127*rh - .22475541*temp*rh \
+        - .00683783*temp*temp - .05481717*rh*rh + .00122874*temp*temp*rh \
+        + .00085282*temp*rh*rh - .00000199*temp*temp*rh*rh
+    if rh < 13 and 80 <= temp <= 112:
+        hi = hi - (13 - rh) / 4 * ((17 - abs(temp - 95)) / 17) ** 0.5
+    elif rh > 85 and 80 <= temp <= 87:
+        hi = hi + (rh - 85) / 10 * (87 - temp) / 5
+    return hi
+
+FORMULAS = {
+    'dew_point': dew_point,
+    'absolute_humidity': absolute_humidity,
+    'heat_index': heat_index,
+}
+
+@dataclass
+class VirtualSensor:
+    sensor_id: int
+    formula: Callable
+    humidity: int
+    temperature: int
+    tolerance: timedelta
+    pending: list = field(default_factory=list)  # Humidity readings awaiting a temperature
+    last_temp: tuple | None = None               # Latest temperature from the previous batch
+
+def _load_virtual_sensors():
+    sensors = []
+    for cfg in config_map.get('virtual_sensors', []):
+        formula = FORMULAS.get(cfg['formula'])
+        if not formula:
+            raise RuntimeError(f"Unknown virtual sensor formula {cfg['formula']}")
+        sensors.append(VirtualSensor(sensor_id=cfg['sensor_id'], formula=formula,
+                                     humidity=cfg['humidity'], temperature=cfg['temperature'],
+                                     tolerance=timedelta(seconds=cfg.get('tolerance', 30))))
+    logging.info(f'Loaded {len(sensors)} virtual sensors')
+    return sensors
+
+# Pairs each humidity reading with the nearest temperature reading no
+# more than tolerance away.  Humidity readings that may still be paired
+# with a temperature from a later batch are kept in v.pending.
+def _pair(v:VirtualSensor, batch):
+    humid = v.pending + sorted((t, float(value)) for (t, sensor_id, value) in batch
+                               if sensor_id == v.humidity)
+    temps = sorted((t, float(value)) for (t, sensor_id, value) in batch
+                   if sensor_id == v.temperature)
+    if v.last_temp:
+        temps.insert(0, v.last_temp)
+    if temps:
+        v.last_temp = temps[-1]
+    temp_times = [t for (t, value) in temps]
+
+    # Readings are timestamped on arrival, so nothing in a later batch
+    # can be older than the newest reading in this one.
+    horizon = max((t for (t, sensor_id, value) in batch), default=None)
+
+    pairs = []
+    v.pending = []
+    for (time, rh) in humid:
+        i = bisect_left(temp_times, time)
+        near = [(abs(temps[j][0] - time), temps[j][1]) for j in (i-1, i)
+                if 0 <= j < len(temps) and abs(temps[j][0] - time) <= v.tolerance]
+        if near:
+            pairs.append((time, rh, min(near)[1]))
+        elif horizon is None or time + v.tolerance >= horizon:
+            v.pending.append((time, rh))
+    return pairs
+
+# Computes derived readings for a batch of (time, sensor_id, value)
+# tuples.  Returns them in the same form.
+def derive(batch):
+    derived = []
+    for v in virtual_sensors:
+        pairs = _pair(v, batch)
+        derived.extend((time, v.sensor_id, round(v.formula(rh, temp), 2))
+                       for (time, rh, temp) in pairs if rh > 0)
+    return derived
+
+# Globals
+virtual_sensors = _load_virtual_sensors()